@@ -1,97 +1,237 @@
 #!/usr/bin/env python3
 
 import argparse
-import collections
-import json
 import socket
+import struct
 import threading
 import time
-from typing import NamedTuple
 
 import numpy as np
+import matplotlib
 import matplotlib.pyplot as plt
 
-
-class Rotation(NamedTuple):
-    roll: float
-    pitch: float
-
-
-class ThreeVector(NamedTuple):
-    """Basic x/y/z vector"""
-
-    x: float
-    y: float
-    z: float
-
-
-class Measurement(NamedTuple):
-    """MPU 6050 sensor readings"""
-
-    timestamp: float
-    temp: float
-    rot: Rotation
-    gyro: ThreeVector
-    acc: ThreeVector
-
-    @classmethod
-    def deserialize(cls, data: bytes) -> "Measurement":
-        timestamp = time.time()
-        json_data = json.loads(data)
-        roll = json_data["roll"]
-        pitch = json_data["pitch"]
-        temp = json_data["temp"]
-        rot = Rotation(roll=roll, pitch=pitch)
-        gyro = ThreeVector(
-            x=json_data["gyro"]["x"],
-            y=json_data["gyro"]["y"],
-            z=json_data["gyro"]["z"],
-        )
-        acc = ThreeVector(
-            x=json_data["acc"]["x"],
-            y=json_data["acc"]["y"],
-            z=json_data["acc"]["z"],
-        )
-        return Measurement(
-            timestamp=timestamp,
-            temp=temp,
-            rot=rot,
-            gyro=gyro,
-            acc=acc,
-        )
+# Prefer QtAgg, which has the fastest draw/blit path of the
+# interactive backends. Stay on matplotlib's default choice when the
+# Qt bindings are missing or the name is unknown (matplotlib < 3.5).
+try:
+    matplotlib.use("QtAgg")
+except (ImportError, ValueError):
+    pass
+
+try:
+    # orjson parses raw bytes-like buffers without a decode step and is
+    # a few times faster on small packets than the stdlib parser.
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    import json
+
+    def _json_loads(data):
+        # stdlib json cannot parse a memoryview, so only the fallback
+        # pays for a bytes copy.
+        return json.loads(bytes(data))
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+# Not exposed by the socket module on every platform; 35 is the Linux
+# value. SCM_TIMESTAMPNS shares it.
+_SO_TIMESTAMPNS = getattr(socket, "SO_TIMESTAMPNS", 35)
+
+
+if msgspec is not None:
+    class _Vector(msgspec.Struct):
+        x: float
+        y: float
+        z: float
+
+    class _Packet(msgspec.Struct):
+        """Wire format of one sensor packet"""
+
+        roll: float
+        pitch: float
+        temp: float
+        gyro: _Vector
+        acc: _Vector
+
+    _DECODER = msgspec.json.Decoder(_Packet)
+else:
+    _DECODER = None
+
+
+def _deserialize(data: memoryview, timestamp: float) -> tuple:
+    """Decode one MPU 6050 packet into a flat tuple of floats
+
+    The order (timestamp, temp, roll, pitch, gyro x/y/z, acc x/y/z)
+    matches the scalar arguments of _ingest_sample, so a sample goes
+    from the wire into the ring buffer without any per-packet objects.
+    """
+    if _DECODER is not None:
+        # One C-level pass from bytes to typed structs; no dict or
+        # per-field indexing on the hot path.
+        packet = _DECODER.decode(data)
+        gyro = packet.gyro
+        acc = packet.acc
+        return (timestamp, packet.temp, packet.roll, packet.pitch, gyro.x,
+                gyro.y, gyro.z, acc.x, acc.y, acc.z)
+
+    json_data = _json_loads(data)
+    gyro = json_data["gyro"]
+    acc = json_data["acc"]
+    return (timestamp, json_data["temp"], json_data["roll"],
+            json_data["pitch"], gyro["x"], gyro["y"], gyro["z"], acc["x"],
+            acc["y"], acc["z"])
 
 
 class UdpListener:
     """Listen for data over UDP"""
+
+    BATCH_SIZE = 32
+
     def __init__(self, port: int):
         self._port = port
         self._addr = ("0.0.0.0", port)
         self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if hasattr(socket, "SO_REUSEPORT"):
+            self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        # Ask for a few MB of kernel receive buffer so bursts queue in
+        # the kernel instead of getting dropped before user space runs.
+        # The kernel may cap (or double) the requested size.
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF,
+                              4 * 1024 * 1024)
+        rcvbuf = self._sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF)
+        # Prefer kernel arrival timestamps: they are stamped when the
+        # packet reaches the socket, not after user space gets around
+        # to parsing it, and skip a time.time() call per packet.
+        try:
+            self._sock.setsockopt(socket.SOL_SOCKET, _SO_TIMESTAMPNS, 1)
+        except OSError:
+            pass
         self._sock.settimeout(1)
         self._sock.bind(self._addr)
-        print(f"Listening on UDP port: {port}")
-
-    def get(self) -> Measurement:
-        """Listen for data and parse it"""
-        raw_data = self._sock.recvfrom(1024)
-        return Measurement.deserialize(raw_data[0])
+        # Receive every datagram into the same preallocated buffer so
+        # steady state allocates no bytes objects at all.
+        self._buf = bytearray(1500)
+        self._view = memoryview(self._buf)
+        print(f"Listening on UDP port: {port} (rcvbuf: {rcvbuf} bytes)")
+
+    def get_batch(self) -> list:
+        """Listen for data and parse it
+
+        Blocks for the first datagram, then drains whatever else is
+        already queued on the socket (up to BATCH_SIZE) without further
+        blocking, so dense bursts cost one wakeup instead of one syscall
+        round-trip per packet.
+        """
+        nbytes, timestamp = self._recv()
+        batch = [_deserialize(self._view[:nbytes], timestamp)]
+        # With a timeout set, CPython waits for readability before
+        # issuing the recv syscall, so MSG_DONTWAIT alone still blocks.
+        # Switch the socket to non-blocking for the drain instead.
+        self._sock.settimeout(0)
+        try:
+            for _ in range(self.BATCH_SIZE - 1):
+                try:
+                    nbytes, timestamp = self._recv()
+                except BlockingIOError:
+                    break
+                batch.append(_deserialize(self._view[:nbytes], timestamp))
+        finally:
+            self._sock.settimeout(1)
+        return batch
+
+    def _recv(self):
+        """Receive one datagram and its arrival timestamp
+
+        Returns the payload length; the payload itself lands in the
+        preallocated buffer. Falls back to time.time() when the kernel
+        did not attach an SCM_TIMESTAMPNS control message.
+        """
+        nbytes, ancdata, _, _ = self._sock.recvmsg_into(
+            [self._view], socket.CMSG_SPACE(16))
+        for level, ctype, cdata in ancdata:
+            if level == socket.SOL_SOCKET and ctype == _SO_TIMESTAMPNS:
+                sec, nsec = struct.unpack("@ll", cdata[:16])
+                return nbytes, sec + 1e-9 * nsec
+        return nbytes, time.time()
 
     def close(self):
         self._sock.close()
 
 
+def _ingest_sample(ts_col, temp_col, roll_col, pitch_col, gyro_x_col,
+                   gyro_y_col, gyro_z_col, acc_x_col, acc_y_col, acc_z_col,
+                   head, timestamp, temp, roll, pitch, gyro_x, gyro_y, gyro_z,
+                   acc_x, acc_y, acc_z, acc_scale):
+    """Write one decoded sample into the ring buffer columns"""
+    ts_col[head] = timestamp
+    temp_col[head] = temp
+    roll_col[head] = roll
+    pitch_col[head] = pitch
+    gyro_x_col[head] = gyro_x
+    gyro_y_col[head] = gyro_y
+    gyro_z_col[head] = gyro_z
+    acc_x_col[head] = acc_scale * acc_x
+    acc_y_col[head] = acc_scale * acc_y
+    acc_z_col[head] = acc_scale * acc_z
+
+
+if numba is not None:
+    _ingest_sample = numba.njit(cache=True, fastmath=True)(_ingest_sample)
+
+
 class DataPlotter:
     """Animate incoming data"""
 
     ROT = ["roll", "pitch"]
 
+    # Ring buffer capacity; a power of two sized to hold a full plot
+    # window at kHz-ish sample rates.
+    RING_CAP = 1 << 14
+
+    # Accelerometer g -> m/s^2, applied once per sample at ingest so
+    # the render path plots the stored values as-is.
+    ACC_SCALE = -9.8
+
     def __init__(self, port: int, window_s: int):
         self._window_s = window_s
         self._listener = UdpListener(port)
         self._start_time = time.time()
-        self._data = collections.deque()
-        self._lock = threading.Lock()
+        # Structure-of-arrays ring buffer: one preallocated column per
+        # scalar so building plot arrays is a slice, not a Python loop.
+        # Sensor data gets float32 columns: the MPU-6050 has nowhere
+        # near double precision, and halving the dtype halves memory
+        # traffic on the per-frame slice/min/max path. Timestamps stay
+        # float64 since epoch seconds do not fit in float32 precision.
+        self._ring = {
+            name: np.empty(self.RING_CAP, dtype=np.float32)
+            for name in ("temp", "roll", "pitch", "gyro_x", "gyro_y",
+                         "gyro_z", "acc_x", "acc_y", "acc_z")
+        }
+        self._ring["ts"] = np.empty(self.RING_CAP, dtype=np.float64)
+        # Single-producer/single-consumer: the listener thread is the
+        # only writer and only bumps this monotonic counter after a
+        # sample is fully written, so the render thread can snapshot it
+        # without a lock. Worst case it reads a slightly stale count.
+        self._written = 0
+        # Per-series 2-D scratch buffers reused by _window_stack, plus
+        # one for the start-relative timestamps built each frame.
+        self._stack_scratch = {}
+        self._ts_scratch = np.empty(self.RING_CAP, dtype=np.float64)
+        # Column tuple in _ingest_sample argument order, resolved once
+        # so the ingest loop does no dict lookups.
+        self._columns = tuple(
+            self._ring[name]
+            for name in ("ts", "temp", "roll", "pitch", "gyro_x", "gyro_y",
+                         "gyro_z", "acc_x", "acc_y", "acc_z"))
         self._update_loop = threading.Thread(daemon=True,
                                              target=self._update_data)
         self._update_loop.start()
@@ -101,6 +241,7 @@ class DataPlotter:
                     (self._gyro_ax,
                      self._empty)) = plt.subplots(2,
                                                   2,
+                                                  sharex=True,
                                                   figsize=(19.2, 10.8),
                                                   dpi=100)
 
@@ -116,8 +257,11 @@ class DataPlotter:
         x_label = "Time since start (s)"
         for i in range(self._rot_series):
             rot_label = self.ROT[i]
+            # animated=True keeps the lines out of full draws so the
+            # cached blit backgrounds never contain stale line pixels.
             self._rot_lines.append(
-                self._rot_ax.plot([], [], label=rot_label)[0])
+                self._rot_ax.plot([], [], label=rot_label,
+                                  animated=True)[0])
             self._rot_ax.set_xlabel(x_label, fontsize=fontsize)
             self._rot_ax.set_ylabel("Rotation (rad)", fontsize=fontsize)
             self._rot_ax.set_xlim([0, self._window_s])
@@ -129,88 +273,181 @@ class DataPlotter:
             acc_label = f"acc.{axis}"
 
             self._gyro_lines.append(
-                self._gyro_ax.plot([], [], label=gyro_label)[0])
+                self._gyro_ax.plot([], [], label=gyro_label,
+                                   animated=True)[0])
             self._gyro_ax.set_xlabel(x_label, fontsize=fontsize)
             self._gyro_ax.set_ylabel("Gyro (rad/s)", fontsize=fontsize)
             self._gyro_ax.set_xlim([0, self._window_s])
             self._gyro_ax.legend(loc="upper left", fontsize=legend_fontsize)
 
             self._acc_lines.append(
-                self._acc_ax.plot([], [], label=acc_label)[0])
+                self._acc_ax.plot([], [], label=acc_label,
+                                  animated=True)[0])
             self._acc_ax.set_xlabel(x_label, fontsize=fontsize)
             self._acc_ax.set_ylabel("Acceleration (m/s^2)", fontsize=fontsize)
             self._acc_ax.set_xlim([0, self._window_s])
             self._acc_ax.legend(loc="upper left", fontsize=legend_fontsize)
 
         self._empty.axis("off")
-        self._fig.canvas.set_window_title("MPU-6050")
+        self._fig.canvas.manager.set_window_title("MPU-6050")
         self._fig.suptitle("MPU-6050 Time Series", fontsize=fontsize)
         self._fig.tight_layout()
 
+        # Per-axes background cache for blitting; populated on the
+        # first full draw and invalidated whenever axis limits change.
+        self._subplots = [
+            (self._rot_ax, self._rot_lines),
+            (self._gyro_ax, self._gyro_lines),
+            (self._acc_ax, self._acc_lines),
+        ]
+        self._backgrounds = None
+        # A window resize redraws the canvas at its new size, so the
+        # cached regions no longer line up; force a recapture.
+        self._fig.canvas.mpl_connect("resize_event", self._on_resize)
+
+    def _on_resize(self, event):
+        self._backgrounds = None
+
     def _update_data(self):
         while True:
             try:
-                point = self._listener.get()
+                batch = self._listener.get_batch()
             except socket.timeout:
                 continue
-            with self._lock:
-                self._update_data_while_locked(point)
-
-    def _update_data_while_locked(self, point: Measurement):
-        self._data.append(point)
-        now = time.time()
-        while len(self._data):
-            if self._data[0].timestamp < now - self._window_s:
-                self._data.popleft()
-            else:
-                break
+            self._ingest_batch(batch)
+
+    def _ingest_batch(self, batch: list):
+        for point in batch:
+            head = self._written % self.RING_CAP
+            _ingest_sample(*self._columns, head, *point, self.ACC_SCALE)
+            self._written += 1
+
+    def _window(self, name: str, head: int, count: int) -> np.ndarray:
+        """The newest `count` samples of one column
+
+        Returns a read-only style snapshot: a direct view of the ring
+        when the window is contiguous, a concatenated copy only when it
+        wraps. Callers must not write through it.
+        """
+        col = self._ring[name]
+        tail = (head - count) % self.RING_CAP
+        if tail + count <= self.RING_CAP:
+            return col[tail:tail + count]
+        return np.concatenate((col[tail:], col[:(tail + count) %
+                                               self.RING_CAP]))
+
+    def _window_stack(self, names, head: int, count: int) -> np.ndarray:
+        """Newest `count` samples of several columns as one 2-D array
+
+        Fills a persistent per-series scratch buffer and returns a view
+        of it, so the frame path allocates nothing.
+        """
+        scratch = self._stack_scratch.get(names)
+        if scratch is None:
+            scratch = np.empty((len(names), self.RING_CAP), dtype=np.float32)
+            self._stack_scratch[names] = scratch
+        tail = (head - count) % self.RING_CAP
+        split = min(count, self.RING_CAP - tail)
+        for i, name in enumerate(names):
+            col = self._ring[name]
+            scratch[i, :split] = col[tail:tail + split]
+            scratch[i, split:count] = col[:count - split]
+        return scratch[:, :count]
 
     def update(self):
         def _update_subplot(ax, timeseries, lines):
             assert len(timeseries) == len(lines)
             for (line, data) in zip(lines, timeseries):
-                line.set_xdata(timestamp)
-                line.set_ydata(data)
-
-            if timestamp[-1] >= self._window_s:
-                ax.set_xlim([timestamp[0], timestamp[-1]])
-            else:
-                ax.set_xlim([0, self._window_s])
+                # One set_data call invalidates the transform once
+                # instead of twice.
+                line.set_data(timestamp, data)
 
             min_y = np.min(timeseries)
             min_y -= 0.1 * np.abs(min_y)
             max_y = np.max(timeseries)
             max_y += 0.1 * np.abs(max_y)
-            ax.set_ylim([min_y, max_y])
-
-        with self._lock:
-            data = list(self._data)
 
-        if len(data) <= 1:
+            changed = False
+            # Rescale y only when the data drifts more than 5% of the
+            # current span past either limit; every rescale invalidates
+            # the blit background, so small wiggles are not worth it.
+            ylim = ax.get_ylim()
+            deadband = 0.05 * (ylim[1] - ylim[0])
+            if (abs(min_y - ylim[0]) > deadband
+                    or abs(max_y - ylim[1]) > deadband):
+                ax.set_ylim((min_y, max_y))
+                changed = True
+            return changed
+
+        # Lock-free snapshot of the producer's progress; samples that
+        # land after this line are simply picked up next frame.
+        written = self._written
+        count = min(written, self.RING_CAP)
+        if count <= 1:
+            return
+        head = written % self.RING_CAP
+
+        # Age-based eviction happens here on the consumer side: the
+        # timestamps are monotonic, so one binary search finds the
+        # first sample still inside the plot window.
+        ts = self._window("ts", head, count)
+        cutoff = time.time() - self._window_s
+        count -= int(np.searchsorted(ts, cutoff))
+        if count <= 1:
             return
 
-        timestamp = np.array([d.timestamp - self._start_time for d in data])
-
-        acc_timeseries = -9.8 * np.array([
-            np.array([d.acc.x for d in data]),
-            np.array([d.acc.y for d in data]),
-            np.array([d.acc.z for d in data]),
-        ])
-        gyro_timeseries = np.array([
-            np.array([d.gyro.x for d in data]),
-            np.array([d.gyro.y for d in data]),
-            np.array([d.gyro.z for d in data]),
-        ])
-        rot_timeseries = np.array([
-            np.array([d.rot.roll for d in data]),
-            np.array([d.rot.pitch for d in data]),
-        ])
-
-        _update_subplot(self._rot_ax, rot_timeseries, self._rot_lines)
-        _update_subplot(self._gyro_ax, gyro_timeseries, self._gyro_lines)
-        _update_subplot(self._acc_ax, acc_timeseries, self._acc_lines)
-
-        self._fig.canvas.draw()
+        timestamp = np.subtract(ts[len(ts) - count:], self._start_time,
+                                out=self._ts_scratch[:count])
+        acc_timeseries = self._window_stack(
+            ("acc_x", "acc_y", "acc_z"), head, count)
+        gyro_timeseries = self._window_stack(
+            ("gyro_x", "gyro_y", "gyro_z"), head, count)
+        rot_timeseries = self._window_stack(
+            ("roll", "pitch"), head, count)
+
+        # The axes share x, so one set_xlim propagates to all subplots.
+        # Advance the scroll in whole-second steps rather than tracking
+        # the newest sample exactly; otherwise xlim changes every frame
+        # and the blit fast path below never runs in steady state.
+        if timestamp[-1] >= self._window_s:
+            right = float(np.ceil(timestamp[-1]))
+            xlim = (right - self._window_s, right)
+        else:
+            xlim = (0, self._window_s)
+        changed = xlim != self._rot_ax.get_xlim()
+        if changed:
+            self._rot_ax.set_xlim(xlim)
+
+        changed |= _update_subplot(self._rot_ax, rot_timeseries,
+                                   self._rot_lines)
+        changed |= _update_subplot(self._gyro_ax, gyro_timeseries,
+                                   self._gyro_lines)
+        changed |= _update_subplot(self._acc_ax, acc_timeseries,
+                                   self._acc_lines)
+
+        canvas = self._fig.canvas
+        if changed or self._backgrounds is None:
+            # Limits moved (or first frame): render everything, capture
+            # the line-free backgrounds (the lines are animated and
+            # skipped by full draws), then paint the lines on top.
+            canvas.draw()
+            self._backgrounds = {
+                ax: canvas.copy_from_bbox(ax.bbox)
+                for ax, _ in self._subplots
+            }
+            for ax, lines in self._subplots:
+                for line in lines:
+                    ax.draw_artist(line)
+                canvas.blit(ax.bbox)
+        else:
+            # Fast path: restore the cached backgrounds and redraw only
+            # the line artists.
+            for ax, lines in self._subplots:
+                canvas.restore_region(self._backgrounds[ax])
+                for line in lines:
+                    ax.draw_artist(line)
+                canvas.blit(ax.bbox)
+        canvas.flush_events()
 
     def close(self):
         self._listener.close()
@@ -228,7 +465,10 @@ if __name__ == "__main__":
 
     args = parser.parse_args()
 
-    plt.ion()
     plotter = DataPlotter(args.port, 10)
-    while True:
-        plotter.update()
+    # Render at ~30 fps off the GUI event loop instead of a busy loop;
+    # between frames the GIL is free for the UDP listener thread.
+    timer = plotter._fig.canvas.new_timer(interval=33)
+    timer.add_callback(plotter.update)
+    timer.start()
+    plt.show()